@@ -22,7 +22,7 @@
 
 import warnings
 from pathlib import Path
-from typing import Any, Callable, List, Optional, Text, Union
+from typing import Any, Callable, Dict, List, Optional, Text, Tuple, Union
 
 import numpy as np
 import torch
@@ -214,64 +214,178 @@ class Inference:
             and (num_frames, dimension) for frame-level tasks.
         """
 
+        return self.slide_batch([waveform], sample_rate)[0]
+
+    def slide_batch(
+        self, waveforms: List[torch.Tensor], sample_rate: int
+    ) -> List[SlidingWindowFeature]:
+        """Slide model on a list of waveforms
+
+        Complete chunks of all waveforms are gathered into the same batches,
+        so that short waveforms do not lead to (almost) empty batches.
+        Last incomplete chunks (i.e. the whole waveform when it is shorter
+        than the window) are gathered into batches of chunks with the same
+        number of samples. They are not padded as this would change the
+        output of the model.
+
+        Parameters
+        ----------
+        waveforms: list of (num_channels, num_samples) torch.Tensor
+            Waveforms.
+        sample_rate : int
+            Sample rate (shared by all waveforms).
+
+        Returns
+        -------
+        outputs : list of SlidingWindowFeature
+            Model output for each waveform. See `slide` for details.
+        """
+
         window_size: int = round(self.duration * sample_rate)
         step_size: int = round(self.step * sample_rate)
-        num_channels, num_samples = waveform.shape
 
         specifications = self.model.specifications
         resolution = specifications.resolution
         introspection = self.model.introspection
-        if resolution == Resolution.CHUNK:
-            frames = SlidingWindow(start=0.0, duration=self.duration, step=self.step)
-        elif resolution == Resolution.FRAME:
-            frames = introspection.frames
-            num_frames_per_chunk, dimension = introspection(window_size)
-
-        # prepare complete chunks
-        if num_samples >= window_size:
-            chunks: torch.Tensor = rearrange(
-                waveform.unfold(1, window_size, step_size),
-                "channel chunk frame -> chunk channel frame",
+        if resolution == Resolution.FRAME:
+            num_frames_per_chunk, _ = introspection(window_size)
+
+        # prepare complete chunks and last incomplete chunk of each waveform
+        chunks: List[torch.Tensor] = list()
+        last_chunks: List[Optional[torch.Tensor]] = list()
+        for waveform in waveforms:
+            num_channels, num_samples = waveform.shape
+
+            if num_samples >= window_size:
+                chunks.append(
+                    rearrange(
+                        waveform.unfold(1, window_size, step_size),
+                        "channel chunk frame -> chunk channel frame",
+                    )
+                )
+            else:
+                chunks.append(waveform.new_empty((0, num_channels, window_size)))
+            num_chunks = len(chunks[-1])
+
+            has_last_chunk = (num_samples < window_size) or (
+                num_samples - window_size
+            ) % step_size > 0
+            last_chunks.append(
+                waveform[:, num_chunks * step_size :] if has_last_chunk else None
             )
-            num_chunks, _, _ = chunks.shape
-        else:
-            num_chunks = 0
-
-        # prepare last incomplete chunk
-        has_last_chunk = (num_samples < window_size) or (
-            num_samples - window_size
-        ) % step_size > 0
-        if has_last_chunk:
-            last_chunk: torch.Tensor = waveform[:, num_chunks * step_size :]
-
-        outputs: Union[List[np.ndarray], np.ndarray] = list()
 
+        total_num_chunks = sum(len(c) for c in chunks) + sum(
+            last_chunk is not None for last_chunk in last_chunks
+        )
+        num_processed_chunks = 0
         if self.progress_hook is not None:
-            self.progress_hook(0, num_chunks + has_last_chunk)
+            self.progress_hook(0, total_num_chunks)
+
+        # outputs[w] will be used to store the outputs of the chunks of wth waveform
+        outputs: List[List[np.ndarray]] = [list() for _ in waveforms]
+
+        # split complete chunks of all waveforms into batches of batch_size chunks:
+        # batches[b] is a list of (w, w_chunks) tuples where w_chunks are the
+        # chunks of wth waveform that belong to bth batch.
+        batches: List[List[Tuple[int, torch.Tensor]]] = [list()]
+        batch_length = 0
+        for w, waveform_chunks in enumerate(chunks):
+            start = 0
+            while start < len(waveform_chunks):
+                if batch_length == self.batch_size:
+                    batches.append(list())
+                    batch_length = 0
+                end = start + self.batch_size - batch_length
+                batches[-1].append((w, waveform_chunks[start:end]))
+                batch_length += len(batches[-1][-1][1])
+                start = end
+
+        # slide over audio chunks of all waveforms in batch
+        for batch in batches:
+            if not batch:
+                continue
+
+            batch_output = self.infer(torch.cat([c for _, c in batch]))
+            num_processed_chunks += len(batch_output)
+
+            batch_output = np.split(
+                batch_output, np.cumsum([len(c) for _, c in batch])[:-1]
+            )
+            for (w, _), output in zip(batch, batch_output):
+                outputs[w].append(output)
 
-        # slide over audio chunks in batch
-        for c in np.arange(0, num_chunks, self.batch_size):
-            batch: torch.Tensor = chunks[c : c + self.batch_size]
-            outputs.append(self.infer(batch))
             if self.progress_hook is not None:
-                self.progress_hook(c + 1, num_chunks + has_last_chunk)
+                self.progress_hook(num_processed_chunks, total_num_chunks)
+
+        # group last incomplete chunks with the same number of samples:
+        # same_length[n] is the list of waveforms whose last chunk has n samples
+        same_length: Dict[int, List[int]] = dict()
+        for w, last_chunk in enumerate(last_chunks):
+            if last_chunk is not None:
+                same_length.setdefault(last_chunk.shape[1], list()).append(w)
+
+        # process last incomplete chunks in batch
+        last_outputs: List[Optional[np.ndarray]] = [None for _ in waveforms]
+        for same_length_waveforms in same_length.values():
+            for start in range(0, len(same_length_waveforms), self.batch_size):
+                batch_waveforms = same_length_waveforms[start : start + self.batch_size]
+                batch_output = self.infer(
+                    torch.stack([last_chunks[w] for w in batch_waveforms])
+                )
+                for w, last_output in zip(batch_waveforms, batch_output):
+                    last_outputs[w] = last_output[np.newaxis]
 
-        # process orphan last chunk
-        if has_last_chunk:
+                num_processed_chunks += len(batch_waveforms)
+                if self.progress_hook is not None:
+                    self.progress_hook(num_processed_chunks, total_num_chunks)
 
-            last_output = self.infer(last_chunk[None])
+        aggregated_outputs: List[SlidingWindowFeature] = list()
 
-            if specifications.resolution == Resolution.FRAME:
-                pad = num_frames_per_chunk - last_output.shape[1]
-                last_output = np.pad(last_output, ((0, 0), (0, pad), (0, 0)))
+        for w, last_output in enumerate(last_outputs):
 
-            outputs.append(last_output)
-            if self.progress_hook is not None:
-                self.progress_hook(
-                    num_chunks + has_last_chunk, num_chunks + has_last_chunk
+            num_chunks = len(chunks[w])
+
+            # pad orphan last chunk output
+            pad = 0
+            if last_output is not None:
+
+                if specifications.resolution == Resolution.FRAME:
+                    pad = num_frames_per_chunk - last_output.shape[1]
+                    last_output = np.pad(last_output, ((0, 0), (0, pad), (0, 0)))
+
+                outputs[w].append(last_output)
+
+            aggregated_outputs.append(
+                self._aggregate(
+                    np.vstack(outputs[w]), num_chunks, last_output is not None, pad
                 )
+            )
+
+        return aggregated_outputs
+
+    def _aggregate(
+        self, outputs: np.ndarray, num_chunks: int, has_last_chunk: bool, pad: int
+    ) -> SlidingWindowFeature:
+        """Aggregate outputs of sliding chunks
 
-        outputs = np.vstack(outputs)
+        Parameters
+        ----------
+        outputs : (num_chunks + has_last_chunk, ...) np.ndarray
+            Model outputs for all complete chunks (and last incomplete chunk).
+        num_chunks : int
+            Number of complete chunks.
+        has_last_chunk : bool
+            Whether outputs contain the output of an incomplete last chunk.
+        pad : int
+            Number of (padded) frames in last chunk output.
+
+        Returns
+        -------
+        output : SlidingWindowFeature
+            Aggregated output. See `slide` for details.
+        """
+
+        specifications = self.model.specifications
 
         # skip aggregation when requested,
         # or when model outputs just one vector per chunk
@@ -287,6 +401,9 @@ class Inference:
             frames = SlidingWindow(start=0.0, duration=self.duration, step=self.step)
             return SlidingWindowFeature(outputs, frames)
 
+        frames = self.model.introspection.frames
+        _, num_frames_per_chunk, dimension = outputs.shape
+
         if self.pre_aggregation_hook is not None:
             outputs = self.pre_aggregation_hook(outputs)
             _, _, dimension = outputs.shape
@@ -22,21 +22,51 @@
 
 """Overlapped speech detection pipelines"""
 
-from typing import Optional
+import weakref
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 
 from pyannote.audio import Inference
-from pyannote.audio.core.io import AudioFile
+from pyannote.audio.core.io import Audio, AudioFile
 from pyannote.audio.core.pipeline import Pipeline
 from pyannote.audio.pipelines.utils import PipelineModel, get_devices, get_model
 from pyannote.audio.utils.signal import Binarize
-from pyannote.core import Annotation, Timeline
-from pyannote.database import get_annotated
+from pyannote.core import Annotation, Segment, Timeline
+from pyannote.core.segment import SEGMENT_PRECISION
+from pyannote.core.utils.generators import string_generator
+from pyannote.database import ProtocolFile, get_annotated
 from pyannote.metrics.detection import DetectionPrecisionRecallFMeasure
 from pyannote.pipeline.parameter import Uniform
 
 
+def _second_largest(scores: np.ndarray) -> np.ndarray:
+    """Get second largest score along last dimension
+
+    Equivalent to np.partition(scores, -2, axis=-1)[:, :, -2, np.newaxis]
+    but done in one pass over the (usually small) last dimension, keeping
+    track of the two largest values seen so far.
+
+    Parameters
+    ----------
+    scores : (num_chunks, num_frames, num_speakers) np.ndarray
+        Speaker activation scores, with num_speakers > 1.
+
+    Returns
+    -------
+    second_largest : (num_chunks, num_frames, 1) np.ndarray
+        Second largest speaker activation score
+    """
+
+    largest = scores[:, :, 0]
+    second_largest = np.full_like(largest, -np.inf)
+    for k in range(1, scores.shape[-1]):
+        score = scores[:, :, k]
+        second_largest = np.maximum(second_largest, np.minimum(largest, score))
+        largest = np.maximum(largest, score)
+    return second_largest[:, :, np.newaxis]
+
+
 def to_overlap(annotation: Annotation) -> Annotation:
     """Get overlapped speech regions
 
@@ -51,14 +81,200 @@ def to_overlap(annotation: Annotation) -> Annotation:
         Overlapped speech annotation.
     """
 
-    overlap = Timeline(uri=annotation.uri)
-    for (s1, t1), (s2, t2) in annotation.co_iter(annotation):
-        l1 = annotation[s1, t1]
-        l2 = annotation[s2, t2]
-        if l1 == l2:
-            continue
-        overlap.add(s1 & s2)
-    return overlap.support().to_annotation(generator="string", modality="overlap")
+    tracks = list(annotation.itertracks(yield_label=True))
+    starts = np.fromiter((segment.start for segment, _, _ in tracks), dtype=float)
+    ends = np.fromiter((segment.end for segment, _, _ in tracks), dtype=float)
+    # labels may be any hashable object: map them to integer codes
+    codes = dict()
+    labels = np.array(
+        [codes.setdefault(label, len(codes)) for _, _, label in tracks], dtype=int
+    )
+
+    # sort tracks by start time so that, for i < j, jth track intersects ith
+    # track iff it starts before ith track ends: each pair of intersecting
+    # tracks is therefore only visited once.
+    order = np.argsort(starts, kind="stable")
+    starts, ends, labels = starts[order], ends[order], labels[order]
+
+    # jth track starts before ith track ends for i < j < last[i]:
+    # enumerate those (i, j) pairs
+    last = np.searchsorted(starts, ends, side="left")
+    num_pairs = np.maximum(last - np.arange(len(starts)) - 1, 0)
+    i = np.repeat(np.arange(len(starts)), num_pairs)
+    offsets = np.repeat(np.cumsum(num_pairs) - num_pairs, num_pairs)
+    j = i + 1 + np.arange(len(i)) - offsets
+
+    # lo (resp. hi) is the start (resp. end) time of the intersection
+    lo = starts[j]
+    hi = np.minimum(ends[i], ends[j])
+
+    # only keep (non-empty) intersections of tracks with different labels
+    mask = (hi - lo > SEGMENT_PRECISION) & (labels[i] != labels[j])
+    lo, hi = lo[mask], hi[mask]
+
+    # merge intersections that overlap (or are contiguous) with each other:
+    # kth intersection starts a new overlapped speech region iff it starts
+    # after all previous ones have ended.
+    order = np.argsort(lo, kind="stable")
+    lo, hi = lo[order], np.maximum.accumulate(hi[order])
+    is_new = np.ones(len(lo), dtype=bool)
+    is_new[1:] = lo[1:] - hi[:-1] > SEGMENT_PRECISION
+    is_last = np.append(is_new[1:], True)[: len(lo)]
+
+    # build annotation in one go (tracks are sorted once) rather than
+    # inserting overlapped speech regions one by one
+    return Annotation.from_records(
+        (
+            (Segment(start, end), "_", label)
+            for start, end, label in zip(lo[is_new], hi[is_last], string_generator())
+        ),
+        uri=annotation.uri,
+        modality="overlap",
+    )
+
+
+def _detection_intervals(annotation: Annotation, uem: Timeline) -> np.ndarray:
+    """Get (sorted, non-overlapping) detected regions within uem
+
+    Parameters
+    ----------
+    annotation : Annotation
+        Detection annotation.
+    uem : Timeline
+        Evaluation map.
+
+    Returns
+    -------
+    intervals : (num_regions, 2) np.ndarray
+        Start and end times of detected regions, cropped to uem.
+    """
+
+    timeline = annotation.get_timeline(copy=False).support()
+    timeline = timeline.crop(uem.support(), mode="intersection")
+    return np.array(
+        [[segment.start, segment.end] for segment in timeline], dtype=float
+    ).reshape(-1, 2)
+
+
+def _intersection_duration(intervals: np.ndarray, other_intervals: np.ndarray) -> float:
+    """Get total duration of the intersection of two sets of regions
+
+    Relies on |A & B| = |A| + |B| - |A | B| where A and B are both made of
+    non-overlapping regions, |A | B| being obtained with one sweep over
+    regions of A and B sorted by start time.
+
+    Parameters
+    ----------
+    intervals, other_intervals : (num_regions, 2) np.ndarray
+        Start and end times of (non-overlapping) regions.
+
+    Returns
+    -------
+    duration : float
+        Total duration of the intersection.
+    """
+
+    both = np.vstack([intervals, other_intervals])
+    if len(both) == 0:
+        return 0.0
+
+    both = both[np.argsort(both[:, 0], kind="stable")]
+    starts, ends = both[:, 0], np.maximum.accumulate(both[:, 1])
+
+    # kth region starts a new region of the union iff it starts after
+    # all previous ones have ended.
+    is_new = np.ones(len(starts), dtype=bool)
+    is_new[1:] = starts[1:] > ends[:-1]
+    is_last = np.append(is_new[1:], True)
+    union = np.sum(ends[is_last] - starts[is_new])
+
+    duration = np.sum(np.diff(intervals, axis=1)) + np.sum(
+        np.diff(other_intervals, axis=1)
+    )
+    return max(0.0, float(duration - union))
+
+
+def _precision(relevant_retrieved: float, hypothesis_intervals: np.ndarray) -> float:
+    """Get detection precision
+
+    Parameters
+    ----------
+    relevant_retrieved : float
+        Duration of the intersection of reference and hypothesis.
+    hypothesis_intervals : (num_regions, 2) np.ndarray
+        Start and end times of hypothesized regions.
+
+    Returns
+    -------
+    precision : float
+        Detection precision (1. when hypothesis is empty).
+    """
+
+    precision_retrieved = np.sum(np.diff(hypothesis_intervals, axis=1))
+    if precision_retrieved == 0.0:
+        return 1.0
+    return relevant_retrieved / precision_retrieved
+
+
+def _recall(relevant_retrieved: float, reference_intervals: np.ndarray) -> float:
+    """Get detection recall
+
+    Parameters
+    ----------
+    relevant_retrieved : float
+        Duration of the intersection of reference and hypothesis.
+    reference_intervals : (num_regions, 2) np.ndarray
+        Start and end times of reference regions.
+
+    Returns
+    -------
+    recall : float
+        Detection recall (1. when reference is empty).
+    """
+
+    recall_relevant = np.sum(np.diff(reference_intervals, axis=1))
+    if recall_relevant == 0.0:
+        return 1.0 if relevant_retrieved == 0.0 else 0.0
+    return relevant_retrieved / recall_relevant
+
+
+# cache of to_overlap(annotation) results, indexed by id(annotation).
+# entries are discarded as soon as the corresponding annotation is garbage-collected.
+_OVERLAP_CACHE: Dict[int, Tuple[int, Annotation]] = dict()
+
+
+def _cached_to_overlap(annotation: Annotation) -> Annotation:
+    """Cached version of `to_overlap`
+
+    Meant to be used on reference annotations that are evaluated over and over
+    (e.g. during pipeline hyper-parameters optimization). Cached result is
+    invalidated as soon as annotation uri or any of its (segment, track, label)
+    tracks changes, including in-place modifications.
+
+    Parameters
+    ----------
+    annotation : Annotation
+        Speaker annotation.
+
+    Returns
+    -------
+    overlap : Annotation
+        Overlapped speech annotation.
+    """
+
+    key = id(annotation)
+    signature = hash((annotation.uri, tuple(annotation.itertracks(yield_label=True))))
+
+    if key in _OVERLAP_CACHE:
+        cached_signature, overlap = _OVERLAP_CACHE[key]
+        if cached_signature == signature:
+            return overlap
+    else:
+        weakref.finalize(annotation, _OVERLAP_CACHE.pop, key, None)
+
+    overlap = to_overlap(annotation)
+    _OVERLAP_CACHE[key] = (signature, overlap)
+    return overlap
 
 
 class OracleOverlappedSpeechDetection(Pipeline):
@@ -125,10 +341,11 @@ class OverlappedSpeechDetection(Pipeline):
             (segmentation_device,) = get_devices(needs=1)
             model.to(segmentation_device)
 
+        # multi-speaker segmentation models are turned into overlapped speech
+        # detection by keeping the second largest speaker score. models
+        # already trained for overlapped speech detection need no hook at all.
         if model.introspection.dimension > 1:
-            inference_kwargs["pre_aggregation_hook"] = lambda scores: np.partition(
-                scores, -2, axis=-1
-            )[:, :, -2, np.newaxis]
+            inference_kwargs["pre_aggregation_hook"] = _second_largest
         self.segmentation_inference_ = Inference(model, **inference_kwargs)
 
         #  hyper-parameters used for hysteresis thresholding
@@ -179,6 +396,50 @@ class OverlappedSpeechDetection(Pipeline):
         overlapped_speech.uri = file["uri"]
         return overlapped_speech
 
+    def apply_batch(self, files: List[AudioFile]) -> List[Annotation]:
+        """Apply overlapped speech detection on a batch of files
+
+        Equivalent to calling `apply` on every file, except that chunks of all
+        files are processed together by the segmentation model, making better
+        use of the GPU when files are short. Note that all files are loaded in
+        memory at once.
+
+        Parameters
+        ----------
+        files : list of AudioFile
+            Processed files. Like `__call__`, accepts anything `Audio.validate_file`
+            accepts (e.g. paths to audio files).
+
+        Returns
+        -------
+        overlapped_speech : list of `pyannote.core.Annotation`
+            Overlapped speech regions, for each file.
+        """
+
+        # same as Pipeline.__call__
+        files = [Audio.validate_file(file) for file in files]
+        if hasattr(self, "preprocessors"):
+            files = [ProtocolFile(file, lazy=self.preprocessors) for file in files]
+
+        if len(files) < 2 or self.segmentation_inference_.window != "sliding":
+            return [self.apply(file) for file in files]
+
+        audio = self.segmentation_inference_.model.audio
+        waveforms = [audio(file)[0] for file in files]
+        activations = self.segmentation_inference_.slide_batch(
+            waveforms, audio.sample_rate
+        )
+
+        hypotheses = []
+        for file, activation in zip(files, activations):
+            file["@overlapped_speech_detection/activation"] = activation
+
+            overlapped_speech = self._binarize(activation)
+            overlapped_speech.uri = file["uri"]
+            hypotheses.append(overlapped_speech)
+
+        return hypotheses
+
     def get_metric(self, **kwargs) -> DetectionPrecisionRecallFMeasure:
         """Get overlapped speech detection metric
 
@@ -202,7 +463,7 @@ class OverlappedSpeechDetection(Pipeline):
                 **kwargs,
             ) -> dict:
                 return super().compute_components(
-                    to_overlap(reference), hypothesis, uem=uem, **kwargs
+                    _cached_to_overlap(reference), hypothesis, uem=uem, **kwargs
                 )
 
         return _Metric()
@@ -228,8 +489,6 @@ class OverlappedSpeechDetection(Pipeline):
                 If recall > target_recall, returns precision.
         """
 
-        fmeasure = DetectionPrecisionRecallFMeasure()
-
         if "overlap_reference" in file:
             overlap_reference = file["overlap_reference"]
 
@@ -238,20 +497,36 @@ class OverlappedSpeechDetection(Pipeline):
             overlap_reference = to_overlap(reference)
             file["overlap_reference"] = overlap_reference
 
-        _ = fmeasure(overlap_reference, hypothesis, uem=get_annotated(file))
-        precision, recall, _ = fmeasure.compute_metrics()
+        if "_annotated_cache" in file:
+            uem = file["_annotated_cache"]
+
+        else:
+            uem = get_annotated(file)
+            file["_annotated_cache"] = uem
+
+        # precision and recall are computed the same way as in
+        # DetectionPrecisionRecallFMeasure, except that only the one needed
+        # for the comparison with the target is computed first, the other one
+        # being only computed when the target is reached.
+        reference_intervals = _detection_intervals(overlap_reference, uem)
+        hypothesis_intervals = _detection_intervals(hypothesis, uem)
+        relevant_retrieved = _intersection_duration(
+            reference_intervals, hypothesis_intervals
+        )
 
         if self.precision is not None:
+            precision = _precision(relevant_retrieved, hypothesis_intervals)
             if precision < self.precision:
                 return precision - self.precision
             else:
-                return recall
+                return _recall(relevant_retrieved, reference_intervals)
 
         elif self.recall is not None:
+            recall = _recall(relevant_retrieved, reference_intervals)
             if recall < self.recall:
                 return recall - self.recall
             else:
-                return precision
+                return _precision(relevant_retrieved, hypothesis_intervals)
 
     def get_direction(self):
         return "maximize"
@@ -23,7 +23,7 @@
 from typing import Text, Tuple, Union
 
 import numpy as np
-import scipy.signal
+import scipy.ndimage
 from torch_audiomentations.core.transforms_interface import BaseWaveformTransform
 
 from pyannote.audio.core.task import Problem, Resolution, Specifications, Task
@@ -134,42 +134,49 @@ class SpeakerChangeDetection(SegmentationTaskMixin, Task):
             y[t] = 1 if there is a change of speaker at tth frame, 0 otherwise.
         """
 
-        num_frames, num_speakers = one_hot_y.shape
-
         #  y[t] = True if speaker change, False otherwise
-        y = np.sum(np.abs(np.diff(one_hot_y, axis=0)), axis=1, keepdims=True)
-        y = np.vstack(([[0]], y > 0))
+        y = np.any(one_hot_y[1:] != one_hot_y[:-1], axis=1, keepdims=True)
+        y = np.vstack(([[False]], y))
 
         # mark frames in the neighborhood of actual change point as positive.
-        window = scipy.signal.triang(2 * self.collar + 1)[:, np.newaxis]
-        y = np.minimum(1, scipy.signal.convolve(y, window, mode="same"))
-        y = 1 * (y > 1e-10)
+        # y[t] = 1 if there is at least one change in [t - collar, t + collar]
+        # (i.e. binary dilation of change points by a 2 * collar + 1 window)
+        # (int8 0/1 output of the filter is viewed back as boolean, without copy)
+        y = scipy.ndimage.maximum_filter1d(
+            y.astype(np.int8).ravel(), size=2 * self.collar + 1, mode="constant"
+        )
+        y = y.view(bool).reshape(-1, 1)
 
         # at this point, all segment boundaries are marked as change, including non-speech/speaker changes.
         # let's remove non-speech/speaker change
 
-        # append empty samples at the beginning/end
-        expanded_y = np.vstack(
-            [
-                np.zeros((self.collar, num_speakers), dtype=one_hot_y.dtype),
-                one_hot_y,
-                np.zeros((self.collar, num_speakers), dtype=one_hot_y.dtype),
-            ]
-        )
-
-        # stride trick. data[i] is now a sliding window of collar length
-        # centered at time step i.
-        data = np.lib.stride_tricks.as_strided(
-            expanded_y,
-            shape=(num_frames, num_speakers, 2 * self.collar + 1),
-            strides=(one_hot_y.strides[0], one_hot_y.strides[1], one_hot_y.strides[0]),
-        )
+        num_frames, num_speakers = one_hot_y.shape
+        window_size = 2 * self.collar + 1
+
+        # pack speaker activity into 64-bit words (with empty samples appended
+        # at the beginning/end): bit k of packed[i, w] is set when speaker
+        # 64 * w + k is active at time step i - collar.
+        num_words = max(1, (num_speakers + 63) // 64)
+        bits = np.zeros((num_frames + 2 * self.collar, 64 * num_words), dtype=np.uint8)
+        bits[self.collar : self.collar + num_frames, :num_speakers] = one_hot_y != 0
+        packed = np.packbits(bits, axis=1, bitorder="little").view(np.uint64)
+
+        # active[i] is the set of speakers active in the window of collar length
+        # centered at time step i, obtained by OR-ing windows of doubling size.
+        active, size = packed, 1
+        while 2 * size <= window_size:
+            active = active[:-size] | active[size:]
+            size *= 2
+        active = active[:num_frames] | active[window_size - size :][:num_frames]
 
         # y[i] = 1 if more than one speaker are speaking in the
         # corresponding window. 0 otherwise
-        x_speakers = 1 * (np.sum(np.sum(data, axis=2) > 0, axis=1) > 1)
+        # (x & (x - 1) is non-zero when more than one bit of x is set)
+        x_speakers = np.any(active & (active - np.uint64(1)), axis=1) | (
+            np.count_nonzero(active, axis=1) > 1
+        )
         x_speakers = x_speakers.reshape(-1, 1)
 
-        y *= x_speakers
+        y &= x_speakers
 
-        return np.squeeze(y)
+        return np.squeeze(y).astype(int)
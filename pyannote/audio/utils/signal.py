@@ -38,6 +38,46 @@ from pyannote.core import Annotation, Segment, SlidingWindowFeature, Timeline
 from pyannote.core.utils.generators import pairwise
 
 
+def _hysteresis(scores: np.ndarray, onset: float, offset: float) -> np.ndarray:
+    """Hysteresis thresholding
+
+    Parameters
+    ----------
+    scores : (num_frames, num_classes) np.ndarray
+        Detection scores.
+    onset, offset : float
+        Onset/offset thresholds.
+
+    Returns
+    -------
+    is_active : (num_frames, num_classes) np.ndarray
+        is_active[t, k] is True if kth class is active at tth frame.
+        kth class is initially active if scores[0, k] > onset. Then, it switches
+        from active to inactive when score goes below offset, and from inactive
+        to active when score goes above onset.
+    """
+
+    num_frames, _ = scores.shape
+
+    switch_on = scores > onset
+    switch_off = scores < offset
+
+    # initial state is known for sure
+    switch_off[0] = ~switch_on[0]
+
+    # when onset < offset, some frames switch state whatever the current state:
+    # the actual state of any frame is therefore the state set by the last frame
+    # that triggered only one type of switch, flipped once for every "toggle"
+    # frame that followed.
+    toggle = switch_on & switch_off
+    frames = np.arange(num_frames)[:, np.newaxis]
+    last = np.maximum.accumulate(np.where(switch_on ^ switch_off, frames, 0), axis=0)
+    num_toggles = np.cumsum(toggle, axis=0)
+    num_toggles -= np.take_along_axis(num_toggles, last, axis=0)
+
+    return np.take_along_axis(switch_on, last, axis=0) ^ (num_toggles % 2 == 1)
+
+
 class Binarize:
     """Binarize detection scores using hysteresis thresholding
 
@@ -101,40 +141,29 @@ class Binarize:
 
         num_frames, num_classes = scores.data.shape
         frames = scores.sliding_window
-        timestamps = [frames[i].middle for i in range(num_frames)]
+        starts = frames.start + np.arange(num_frames) * frames.step
+        timestamps = 0.5 * (starts + (starts + frames.duration))
+
+        is_active = _hysteresis(scores.data, self.onset, self.offset)
+
+        # switches[t, k] = 1 (resp. -1) when kth class switches from inactive
+        # to active (resp. from active to inactive) at tth frame. last row
+        # accounts for active regions that are still active at the end.
+        switches = np.diff(np.pad(is_active.astype(np.int8), ((1, 1), (0, 0))), axis=0)
 
         # annotation meant to store 'active' regions
         active = Annotation()
 
-        for k, k_scores in enumerate(scores.data.T):
+        for k, k_switches in enumerate(switches.T):
 
             label = k if scores.labels is None else scores.labels[k]
 
-            # initial state
-            start = timestamps[0]
-            is_active = k_scores[0] > self.onset
-
-            for t, y in zip(timestamps[1:], k_scores[1:]):
-
-                # currently active
-                if is_active:
-                    # switching from active to inactive
-                    if y < self.offset:
-                        region = Segment(start - self.pad_onset, t + self.pad_offset)
-                        active[region, k] = label
-                        start = t
-                        is_active = False
-
-                # currently inactive
-                else:
-                    # switching from inactive to active
-                    if y > self.onset:
-                        start = t
-                        is_active = True
-
-            # if active at the end, add final region
-            if is_active:
-                region = Segment(start - self.pad_onset, t + self.pad_offset)
+            (on,) = np.nonzero(k_switches == 1)
+            (off,) = np.nonzero(k_switches == -1)
+            off = np.minimum(off, num_frames - 1)
+
+            for start, end in zip(timestamps[on], timestamps[off]):
+                region = Segment(start - self.pad_onset, end + self.pad_offset)
                 active[region, k] = label
 
         # because of padding, some active regions might be overlapping: merge them.
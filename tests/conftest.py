@@ -0,0 +1,18 @@
+import pytest
+import pytorch_lightning as pl
+
+from pyannote.audio.models.segmentation.debug import SimpleSegmentationModel
+from pyannote.audio.tasks import VoiceActivityDetection
+from pyannote.database import FileFinder, get_protocol
+
+
+@pytest.fixture(scope="session")
+def trained():
+    protocol = get_protocol(
+        "Debug.SpeakerDiarization.Debug", preprocessors={"audio": FileFinder()}
+    )
+    vad = VoiceActivityDetection(protocol, duration=2.0, batch_size=16, num_workers=4)
+    model = SimpleSegmentationModel(task=vad)
+    trainer = pl.Trainer(fast_dev_run=True)
+    trainer.fit(model, vad)
+    return protocol, model
@@ -1,11 +1,10 @@
+import math
+
 import numpy as np
 import pytest
-import pytorch_lightning as pl
 
 from pyannote.audio import Inference, Model
 from pyannote.audio.core.task import Resolution
-from pyannote.audio.models.segmentation.debug import SimpleSegmentationModel
-from pyannote.audio.tasks import VoiceActivityDetection
 from pyannote.core import SlidingWindowFeature
 from pyannote.database import FileFinder, get_protocol
 
@@ -22,18 +21,6 @@ def test_hf_download_model():
     assert isinstance(model, Model)
 
 
-@pytest.fixture()
-def trained():
-    protocol = get_protocol(
-        "Debug.SpeakerDiarization.Debug", preprocessors={"audio": FileFinder()}
-    )
-    vad = VoiceActivityDetection(protocol, duration=2.0, batch_size=16, num_workers=4)
-    model = SimpleSegmentationModel(task=vad)
-    trainer = pl.Trainer(fast_dev_run=True)
-    trainer.fit(model, vad)
-    return protocol, model
-
-
 @pytest.fixture()
 def pretrained_model():
     return Model.from_pretrained(HF_SAMPLE_MODEL_ID)
@@ -95,3 +82,53 @@ def test_skip_aggregation(pretrained_model, dev_file):
     inference = Inference(pretrained_model, skip_aggregation=True)
     scores = inference(dev_file)
     assert len(scores.data.shape) == 3
+
+
+def test_slide_batch(trained):
+    protocol, model = trained
+    inference = Inference(model, batch_size=16)
+    waveforms = [model.audio(file)[0] for file in protocol.development()]
+    sample_rate = model.audio.sample_rate
+    outputs = inference.slide_batch(waveforms, sample_rate)
+    assert len(outputs) == len(waveforms)
+    for waveform, output in zip(waveforms, outputs):
+        expected = inference.slide(waveform, sample_rate)
+        np.testing.assert_allclose(output.data, expected.data, rtol=1e-5, atol=1e-6)
+
+
+def test_slide_batch_num_forward_passes(trained, monkeypatch):
+    protocol, model = trained
+    inference = Inference(model, batch_size=32)
+    sample_rate = model.audio.sample_rate
+    waveform, _ = model.audio(next(protocol.development()))
+
+    num_forward_passes = 0
+    infer = inference.infer
+
+    def counting_infer(chunks):
+        nonlocal num_forward_passes
+        num_forward_passes += 1
+        return infer(chunks)
+
+    monkeypatch.setattr(inference, "infer", counting_infer)
+
+    # 20 clips shorter than the window are processed in one forward pass
+    num_samples = round(0.5 * inference.duration * sample_rate)
+    waveforms = [
+        waveform[:, i * num_samples : (i + 1) * num_samples] for i in range(20)
+    ]
+    outputs = inference.slide_batch(waveforms, sample_rate)
+    assert num_forward_passes == 1
+    for waveform_, output in zip(waveforms, outputs):
+        expected = inference.slide(waveform_, sample_rate)
+        np.testing.assert_allclose(output.data, expected.data, rtol=1e-5, atol=1e-6)
+
+    # last chunks of files with the same duration are processed together
+    num_forward_passes = 0
+    num_samples = round(2.55 * inference.duration * sample_rate)
+    waveforms = [waveform[:, :num_samples], waveform[:, num_samples : 2 * num_samples]]
+    window_size = round(inference.duration * sample_rate)
+    step_size = round(inference.step * sample_rate)
+    num_chunks = 2 * ((num_samples - window_size) // step_size + 1)
+    inference.slide_batch(waveforms, sample_rate)
+    assert num_forward_passes == math.ceil(num_chunks / inference.batch_size) + 1
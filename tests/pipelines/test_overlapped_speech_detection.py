@@ -0,0 +1,209 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from pyannote.audio.pipelines.overlapped_speech_detection import (
+    OverlappedSpeechDetection,
+    _cached_to_overlap,
+    to_overlap,
+)
+from pyannote.core import Annotation, Segment, Timeline
+from pyannote.metrics.detection import DetectionPrecisionRecallFMeasure
+
+
+def co_iter_to_overlap(annotation: Annotation) -> Annotation:
+    # original (loop-based) implementation of to_overlap, used as reference
+    overlap = Timeline(uri=annotation.uri)
+    for (s1, t1), (s2, t2) in annotation.co_iter(annotation):
+        l1 = annotation[s1, t1]
+        l2 = annotation[s2, t2]
+        if l1 == l2:
+            continue
+        overlap.add(s1 & s2)
+    return overlap.support().to_annotation(generator="string", modality="overlap")
+
+
+def assert_same_overlap(annotation: Annotation):
+    actual = to_overlap(annotation)
+    expected = co_iter_to_overlap(annotation)
+    assert list(actual.itertracks(yield_label=True)) == list(
+        expected.itertracks(yield_label=True)
+    )
+
+
+def test_to_overlap():
+    annotation = Annotation(uri="uri")
+    annotation[Segment(0, 4)] = "A"
+    annotation[Segment(1, 2)] = "B"
+    annotation[Segment(3, 6)] = "C"
+    annotation[Segment(5, 7), "other"] = "C"
+    annotation[Segment(8, 9)] = "A"
+    assert_same_overlap(annotation)
+
+
+def test_to_overlap_empty():
+    assert_same_overlap(Annotation(uri="uri"))
+
+
+def test_to_overlap_touching_segments():
+    annotation = Annotation(uri="uri")
+    annotation[Segment(0, 1)] = "A"
+    annotation[Segment(1, 2)] = "B"
+    annotation[Segment(2, 3)] = "A"
+    assert_same_overlap(annotation)
+
+
+def test_to_overlap_round_off():
+    # 0.1 + 0.2 > 0.3 because of floating point round-off
+    annotation = Annotation(uri="uri")
+    annotation[Segment(0.1, 0.1 + 0.2)] = "A"
+    annotation[Segment(0.3, 1.0)] = "B"
+    assert_same_overlap(annotation)
+    assert len(to_overlap(annotation)) == 0
+
+
+def test_to_overlap_random_jitter():
+    rng = np.random.default_rng(seed=0)
+    for _ in range(200):
+        annotation = Annotation(uri="uri")
+        boundaries = np.round(rng.uniform(0, 10, size=(10, 2)), decimals=1)
+        jitter = rng.uniform(-1e-15, 1e-15, size=(10, 2))
+        for t, (start, end) in enumerate(np.sort(boundaries + jitter, axis=1)):
+            annotation[Segment(start, end), t] = rng.choice(["A", "B", "C"])
+        assert_same_overlap(annotation)
+
+
+def expected_loss(pipeline, reference, hypothesis, uem):
+    # original (metric-based) implementation of loss, used as reference
+    fmeasure = DetectionPrecisionRecallFMeasure()
+    _ = fmeasure(to_overlap(reference), hypothesis, uem=uem)
+    precision, recall, _ = fmeasure.compute_metrics()
+
+    if pipeline.precision is not None:
+        if precision < pipeline.precision:
+            return precision - pipeline.precision
+        return recall
+
+    if recall < pipeline.recall:
+        return recall - pipeline.recall
+    return precision
+
+
+def get_reference():
+    reference = Annotation(uri="uri")
+    reference[Segment(0, 5)] = "A"
+    reference[Segment(3, 8)] = "B"
+    reference[Segment(10, 15)] = "A"
+    reference[Segment(12, 20)] = "C"
+    return reference
+
+
+def get_hypothesis(*segments):
+    hypothesis = Annotation(uri="uri", modality="overlap")
+    for segment in segments:
+        hypothesis[segment] = "overlap"
+    return hypothesis
+
+
+@pytest.mark.parametrize(
+    "reference, hypothesis, uem",
+    [
+        # regular case
+        (
+            get_reference(),
+            get_hypothesis(Segment(2, 4), Segment(4.5, 6), Segment(11, 14)),
+            Timeline([Segment(0, 20)]),
+        ),
+        # partial uem
+        (
+            get_reference(),
+            get_hypothesis(Segment(2, 4), Segment(4.5, 6), Segment(11, 14)),
+            Timeline([Segment(1, 3.5), Segment(4, 13)]),
+        ),
+        # empty reference
+        (
+            Annotation(uri="uri"),
+            get_hypothesis(Segment(2, 4), Segment(11, 14)),
+            Timeline([Segment(0, 20)]),
+        ),
+        # empty hypothesis
+        (get_reference(), get_hypothesis(), Timeline([Segment(0, 20)])),
+        # empty reference and hypothesis
+        (Annotation(uri="uri"), get_hypothesis(), Timeline([Segment(0, 20)])),
+    ],
+)
+@pytest.mark.parametrize(
+    "target", [{"precision": 0.5}, {"precision": 0.9}, {"recall": 0.3}, {"recall": 0.9}]
+)
+def test_loss(trained, reference, hypothesis, uem, target):
+    _, model = trained
+    pipeline = OverlappedSpeechDetection(segmentation=model, **target)
+    file = {"uri": "uri", "annotation": reference, "annotated": uem}
+    expected = expected_loss(pipeline, reference, hypothesis, uem)
+    assert pipeline.loss(file, hypothesis) == pytest.approx(expected)
+
+
+def test_cached_to_overlap():
+    annotation = Annotation(uri="uri")
+    annotation[Segment(0, 4), "a"] = "A"
+    annotation[Segment(1, 2), "b"] = "B"
+    annotation[Segment(3, 6), "c"] = "C"
+
+    # cache hit
+    overlap = _cached_to_overlap(annotation)
+    assert _cached_to_overlap(annotation) is overlap
+
+    # relabeling a track in place (same number of tracks) invalidates the cache
+    annotation[Segment(1, 2), "b"] = "A"
+    overlap = _cached_to_overlap(annotation)
+    assert overlap.get_timeline() == to_overlap(annotation).get_timeline()
+    assert overlap.get_timeline() == Timeline([Segment(3, 4)])
+    assert _cached_to_overlap(annotation) is overlap
+
+
+@pytest.fixture()
+def pipeline(trained):
+    _, model = trained
+    pipeline = OverlappedSpeechDetection(segmentation=model, batch_size=16)
+    pipeline.instantiate(
+        {"onset": 0.5, "offset": 0.5, "min_duration_on": 0.0, "min_duration_off": 0.0}
+    )
+    return pipeline
+
+
+def test_apply_batch(trained, pipeline):
+    protocol, _ = trained
+    files = list(protocol.development())
+    hypotheses = pipeline.apply_batch(files)
+    assert hypotheses == [pipeline(file) for file in files]
+
+
+def test_apply_batch_short_files(trained, pipeline):
+    protocol, model = trained
+    waveform, sample_rate = model.audio(next(protocol.development()))
+    # files shorter than the window, some of them with the same duration
+    durations = [0.5, 0.5, 1.0, 1.5, 1.0]
+    num_samples = [round(duration * sample_rate) for duration in durations]
+    files = [
+        {"waveform": waveform[:, :n], "sample_rate": sample_rate, "uri": f"short{i}"}
+        for i, n in enumerate(num_samples)
+    ]
+    hypotheses = pipeline.apply_batch(files)
+    assert hypotheses == [pipeline(file) for file in files]
+
+
+def test_apply_batch_paths(pipeline):
+    files = ["tests/data/dev00.wav", Path("tests/data/dev01.wav")]
+    hypotheses = pipeline.apply_batch(files)
+    assert hypotheses == [pipeline(file) for file in files]
+    assert [hypothesis.uri for hypothesis in hypotheses] == ["dev00", "dev01"]
+
+
+def test_apply_batch_single_path(pipeline):
+    file = "tests/data/dev00.wav"
+    assert pipeline.apply_batch([file]) == [pipeline(file)]
+
+
+def test_apply_batch_empty(pipeline):
+    assert pipeline.apply_batch([]) == []
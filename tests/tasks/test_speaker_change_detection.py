@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+import scipy.signal
+
+from pyannote.audio.tasks import SpeakerChangeDetection
+from pyannote.database import FileFinder, get_protocol
+
+
+def original_prepare_y(one_hot_y: np.ndarray, collar: int) -> np.ndarray:
+    # original (convolution-based) implementation of prepare_y, used as reference
+    num_frames, num_speakers = one_hot_y.shape
+
+    y = np.sum(np.abs(np.diff(one_hot_y, axis=0)), axis=1, keepdims=True)
+    y = np.vstack(([[0]], y > 0))
+
+    window = scipy.signal.windows.triang(2 * collar + 1)[:, np.newaxis]
+    y = np.minimum(1, scipy.signal.convolve(y, window, mode="same"))
+    y = 1 * (y > 1e-10)
+
+    expanded_y = np.vstack(
+        [
+            np.zeros((collar, num_speakers), dtype=one_hot_y.dtype),
+            one_hot_y,
+            np.zeros((collar, num_speakers), dtype=one_hot_y.dtype),
+        ]
+    )
+    data = np.lib.stride_tricks.as_strided(
+        expanded_y,
+        shape=(num_frames, num_speakers, 2 * collar + 1),
+        strides=(one_hot_y.strides[0], one_hot_y.strides[1], one_hot_y.strides[0]),
+    )
+    x_speakers = 1 * (np.sum(np.sum(data, axis=2) > 0, axis=1) > 1)
+    x_speakers = x_speakers.reshape(-1, 1)
+
+    y *= x_speakers
+
+    return np.squeeze(y)
+
+
+@pytest.fixture(scope="module")
+def protocol():
+    return get_protocol(
+        "Debug.SpeakerDiarization.Debug", preprocessors={"audio": FileFinder()}
+    )
+
+
+@pytest.mark.parametrize("collar", [0, 1, 2, 5])
+@pytest.mark.parametrize("num_speakers", [0, 1, 2, 3, 64, 65, 130])
+@pytest.mark.parametrize("dtype", [np.int8, np.int64, np.float32, np.float64])
+def test_prepare_y(protocol, collar, num_speakers, dtype):
+    scd = SpeakerChangeDetection(protocol, collar=collar)
+    rng = np.random.default_rng(seed=0)
+    for num_frames in [2, 3, 10, 100]:
+        for probability in [0.01, 0.1, 0.5]:
+            one_hot_y = (rng.random((num_frames, num_speakers)) < probability).astype(
+                dtype
+            )
+            actual = scd.prepare_y(one_hot_y)
+            expected = original_prepare_y(one_hot_y, collar)
+            np.testing.assert_array_equal(actual, expected)
+            assert actual.dtype == expected.dtype
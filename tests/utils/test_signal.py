@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from pyannote.audio.utils.signal import Binarize
+from pyannote.core import Annotation, Segment, SlidingWindow, SlidingWindowFeature
+
+
+def loop_binarize(scores: SlidingWindowFeature, onset: float, offset: float):
+    # original (frame-by-frame) hysteresis thresholding, used as reference
+    num_frames, _ = scores.data.shape
+    frames = scores.sliding_window
+    timestamps = [frames[i].middle for i in range(num_frames)]
+
+    active = Annotation()
+    for k, k_scores in enumerate(scores.data.T):
+        start = timestamps[0]
+        is_active = k_scores[0] > onset
+        for t, y in zip(timestamps[1:], k_scores[1:]):
+            if is_active:
+                if y < offset:
+                    active[Segment(start, t), k] = k
+                    start = t
+                    is_active = False
+            else:
+                if y > onset:
+                    start = t
+                    is_active = True
+        if is_active:
+            active[Segment(start, timestamps[-1]), k] = k
+    return active
+
+
+def random_scores(rng, num_frames: int, num_classes: int = 3, nan: bool = False):
+    data = rng.random((num_frames, num_classes))
+    if nan:
+        data[rng.random(data.shape) < 0.1] = np.nan
+    frames = SlidingWindow(start=0.0, duration=0.02, step=0.01)
+    return SlidingWindowFeature(data, frames)
+
+
+@pytest.mark.parametrize(
+    "onset, offset", [(0.5, 0.5), (0.7, 0.3), (0.6, 0.6), (0.3, 0.7), (0.4, 0.6)]
+)
+@pytest.mark.parametrize("nan", [False, True])
+def test_binarize(onset, offset, nan):
+    rng = np.random.default_rng(seed=0)
+    binarize = Binarize(onset=onset, offset=offset)
+    for num_frames in [2, 3, 10, 100]:
+        for _ in range(20):
+            scores = random_scores(rng, num_frames, nan=nan)
+            actual = binarize(scores)
+            expected = loop_binarize(scores, onset, offset)
+            assert list(actual.itertracks(yield_label=True)) == list(
+                expected.itertracks(yield_label=True)
+            )
+
+
+@pytest.mark.parametrize("score", [0.0, 1.0, np.nan])
+def test_binarize_single_frame(score):
+    frames = SlidingWindow(start=0.0, duration=0.02, step=0.01)
+    scores = SlidingWindowFeature(np.array([[score]]), frames)
+    assert len(Binarize(onset=0.5, offset=0.5)(scores)) == 0